@@ -5,28 +5,221 @@ Captures video from USB camera and streams it via HTTP
 """
 
 import cv2
+import numpy as np
 import threading
 import time
-from flask import Flask, Response, render_template, jsonify
+from flask import Flask, Response, render_template, jsonify, request
 from flask_cors import CORS
+import ctypes
+import ctypes.util
+import io
+import json
 import logging
 import argparse
 import os
+import socket
+
+# Optional libjpeg-turbo binding for fast SIMD JPEG encoding
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR, TJSAMP_420
+    TURBOJPEG_AVAILABLE = True
+except ImportError:
+    TURBOJPEG_AVAILABLE = False
+
+# Optional Numba JIT for the downscale kernel used by low-bandwidth viewers
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Production WSGI server with a bounded worker pool
+try:
+    from waitress import serve as waitress_serve
+    WAITRESS_AVAILABLE = True
+except ImportError:
+    WAITRESS_AVAILABLE = False
+
+# Optional Raspberry Pi camera stack with hardware JPEG encoding
+try:
+    from picamera2 import Picamera2
+    from picamera2.encoders import MJPEGEncoder, Quality
+    from picamera2.outputs import FileOutput
+    PICAMERA2_AVAILABLE = True
+except ImportError:
+    PICAMERA2_AVAILABLE = False
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Streaming JPEG settings for the cv2.imencode fallback: baseline,
+# non-progressive, single-pass Huffman — the shape libjpeg-turbo's SIMD
+# kernels accelerate most; two-pass Huffman optimization only trades encode
+# time for a few percent of size on frames that live for 33 ms. The lower
+# chroma quality exploits the eye's weaker color acuity to cut bandwidth.
+JPEG_ENCODE_PARAMS = [
+    cv2.IMWRITE_JPEG_QUALITY, 80,
+    cv2.IMWRITE_JPEG_OPTIMIZE, 0,
+    cv2.IMWRITE_JPEG_PROGRESSIVE, 0,
+    cv2.IMWRITE_JPEG_LUMA_QUALITY, 80,
+    cv2.IMWRITE_JPEG_CHROMA_QUALITY, 70,
+]
+
+# Keep OpenCV single-threaded: frames are decoded/encoded one at a time in
+# the capture thread, and OpenCV's internal worker pool only adds scheduling
+# and cache contention against the HTTP threads
+cv2.setNumThreads(1)
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, cache=True)
+    def downscale_nn(src, dst):
+        """Nearest-neighbor downscale of a BGR frame into a preallocated dst"""
+        src_h, src_w = src.shape[0], src.shape[1]
+        dst_h, dst_w = dst.shape[0], dst.shape[1]
+        for y in prange(dst_h):
+            src_y = y * src_h // dst_h
+            for x in range(dst_w):
+                src_x = x * src_w // dst_w
+                for c in range(3):
+                    dst[y, x, c] = src[src_y, src_x, c]
+else:
+    def downscale_nn(src, dst):
+        """Nearest-neighbor downscale of a BGR frame into a preallocated dst"""
+        cv2.resize(src, (dst.shape[1], dst.shape[0]), dst=dst,
+                   interpolation=cv2.INTER_NEAREST)
+
+def check_jpeg_simd_support():
+    """Warn if OpenCV's JPEG encoder lacks libjpeg-turbo SIMD acceleration"""
+    build_info = cv2.getBuildInformation()
+    if 'libjpeg-turbo' not in build_info:
+        logger.warning("OpenCV is not built against libjpeg-turbo; JPEG encoding will be slow")
+    elif 'SIMD Support:               YES' not in build_info and 'SIMD Support: YES' not in build_info:
+        logger.warning("OpenCV's libjpeg-turbo has SIMD disabled; JPEG encoding will be slow")
+
+class _TurboJPEGCompressor:
+    """tjCompress2 wrapper that reuses one worst-case output buffer
+
+    PyTurboJPEG allocates a fresh destination buffer inside every encode()
+    call. Compressing with TJFLAG_NOREALLOC into a buffer pre-sized by
+    tjBufSize leaves the immutable bytes snapshot handed to viewers as the
+    only per-frame allocation.
+    """
+    # From turbojpeg.h
+    _TJPF_BGR = 1
+    _TJSAMP_420 = 2
+    _TJFLAG_NOREALLOC = 1024
+
+    def __init__(self, width, height, quality=85):
+        lib_name = ctypes.util.find_library('turbojpeg')
+        if lib_name is None:
+            raise OSError("libturbojpeg not found")
+        lib = ctypes.cdll.LoadLibrary(lib_name)
+        lib.tjInitCompress.restype = ctypes.c_void_p
+        lib.tjBufSize.restype = ctypes.c_ulong
+        lib.tjBufSize.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int]
+        lib.tjCompress2.restype = ctypes.c_int
+        lib.tjCompress2.argtypes = [
+            ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int, ctypes.c_int,
+            ctypes.c_int, ctypes.c_int, ctypes.POINTER(ctypes.c_void_p),
+            ctypes.POINTER(ctypes.c_ulong), ctypes.c_int, ctypes.c_int,
+            ctypes.c_int]
+        self._lib = lib
+        self._handle = lib.tjInitCompress()
+        if not self._handle:
+            raise OSError("tjInitCompress failed")
+        self._quality = quality
+        self._buf = ctypes.create_string_buffer(
+            lib.tjBufSize(width, height, self._TJSAMP_420))
+        # The output buffer is shared, so encodes are serialized
+        self._lock = threading.Lock()
+
+    def encode(self, frame):
+        """Compress a contiguous BGR frame, returning JPEG bytes or None"""
+        height, width = frame.shape[:2]
+        with self._lock:
+            buf_ptr = ctypes.c_void_p(ctypes.addressof(self._buf))
+            jpeg_size = ctypes.c_ulong(ctypes.sizeof(self._buf))
+            status = self._lib.tjCompress2(
+                self._handle, ctypes.c_void_p(frame.ctypes.data),
+                width, frame.strides[0], height, self._TJPF_BGR,
+                ctypes.byref(buf_ptr), ctypes.byref(jpeg_size),
+                self._TJSAMP_420, self._quality, self._TJFLAG_NOREALLOC)
+            if status != 0:
+                return None
+            return ctypes.string_at(buf_ptr, jpeg_size.value)
+
+class _JpegStreamOutput(io.BufferedIOBase):
+    """File-like sink receiving hardware-encoded JPEG frames from picamera2"""
+    def __init__(self, streamer):
+        self.streamer = streamer
+
+    def writable(self):
+        return True
+
+    def write(self, buf):
+        self.streamer._publish_jpeg(bytes(buf))
+        return len(buf)
+
 class CameraStreamer:
-    def __init__(self, camera_index=0, width=640, height=480, fps=30):
+    # Frame ring buffer slots; consumers lag the writer by at most one slot,
+    # so 4 slots give ~100 ms of slack at 30 fps before an overwrite
+    RING_SLOTS = 4
+
+    # Most distinct downscale resolutions cached at once; each entry holds
+    # a frame buffer, so the cache must not grow with client whims
+    MAX_SCALED_CACHE = 8
+
+    # Constant part of each MJPEG chunk, built once instead of per frame
+    _MJPEG_PREFIX = b'--frame\r\nContent-Type: image/jpeg\r\nContent-Length: '
+
+    def __init__(self, camera_index=0, width=640, height=480, fps=30,
+                 backend='opencv'):
         self.camera_index = camera_index
         self.width = width
         self.height = height
         self.fps = fps
+        self.backend = backend
         self.camera = None
-        self.frame = None
+        self.picam2 = None
+        # Frame ring buffer, allocated once in initialize_camera; the
+        # monotonic frame counter is published after each write, so readers
+        # never need a lock (single word assignments are atomic in CPython)
+        self._ring = None
+        self._frame_count = 0
+        # Set when the camera delivers MJPEG natively, letting us stream
+        # its compressed buffers without any re-encode
+        self._mjpg_passthrough = False
+        self._latest_jpeg = None
+        # Downscaled JPEGs for low-bandwidth viewers, keyed by (width, height):
+        # (frame count, jpeg bytes, reusable downscale buffer). The lock
+        # keeps concurrent request threads from downscaling into the same
+        # buffer at once
+        self._scaled_jpegs = {}
+        self._scaled_lock = threading.Lock()
+        # In-place frame preprocessing passes; see add_preprocessor
+        self.preprocessors = []
         self.is_streaming = False
+        # Status responses are serialized when state changes, not per request
+        self._status_json = None
+        self._refresh_status_json()
         self.lock = threading.Lock()
+        # Signalled once per captured frame so consumers never poll
+        self.frame_ready = threading.Condition(self.lock)
+
+        # Persistent TurboJPEG encoder (falls back to cv2.imencode if
+        # unavailable); the reusable-buffer compressor is built once the
+        # actual frame size is known in initialize_camera
+        self._tj = None
+        self._tj_compressor = None
+        if TURBOJPEG_AVAILABLE:
+            try:
+                self._tj = TurboJPEG()
+                logger.info("Using TurboJPEG for JPEG encoding")
+            except (OSError, RuntimeError) as e:
+                logger.warning(f"TurboJPEG unavailable, falling back to cv2.imencode: {e}")
+        if self._tj is None:
+            check_jpeg_simd_support()
         
     def initialize_camera(self):
         """Initialize the USB camera"""
@@ -45,6 +238,26 @@ class CameraStreamer:
             actual_height = int(self.camera.get(cv2.CAP_PROP_FRAME_HEIGHT))
             actual_fps = int(self.camera.get(cv2.CAP_PROP_FPS))
             
+            # Size the reusable JPEG output buffer for the actual frame size
+            try:
+                self._tj_compressor = _TurboJPEGCompressor(actual_width, actual_height)
+                logger.info("Using reusable TurboJPEG output buffer for encoding")
+            except OSError:
+                self._tj_compressor = None
+
+            # Most USB cameras compress to MJPEG on-board; if we can get
+            # those buffers raw, the JPEG encode step disappears entirely.
+            # Preprocessing passes need decoded pixels, so they force the
+            # decode + encode path
+            self._mjpg_passthrough = (not self.preprocessors
+                                      and self._try_mjpg_passthrough())
+
+            if not self._mjpg_passthrough:
+                # Allocate the frame ring once; read() fills the slots in place
+                self._ring = np.empty((self.RING_SLOTS, actual_height, actual_width, 3),
+                                      dtype=np.uint8)
+            self._frame_count = 0
+
             logger.info(f"Camera initialized: {actual_width}x{actual_height} @ {actual_fps}fps")
             return True
             
@@ -52,53 +265,265 @@ class CameraStreamer:
             logger.error(f"Failed to initialize camera: {e}")
             return False
     
+    def _try_mjpg_passthrough(self):
+        """Ask the camera for raw MJPEG buffers; returns True if it delivers them"""
+        self.camera.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+        self.camera.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+        ret, probe = self.camera.read()
+        # A compressed buffer starts with the JPEG SOI marker and is not
+        # a decoded 3-channel image
+        if ret and probe is not None and probe.ndim < 3 \
+                and probe.tobytes()[:2] == b'\xff\xd8':
+            logger.info("Camera delivers MJPEG natively; streaming without re-encode")
+            return True
+        # Back to decoded BGR frames
+        self.camera.set(cv2.CAP_PROP_CONVERT_RGB, 1)
+        return False
+
+    def _refresh_status_json(self):
+        """Re-serialize the status payload after a state change"""
+        self._status_json = json.dumps({
+            "is_streaming": self.is_streaming,
+            "width": self.width,
+            "height": self.height,
+            "fps": self.fps
+        }).encode('utf-8')
+
+    def status_json(self):
+        """Pre-serialized camera status as JSON bytes"""
+        return self._status_json
+
+    def add_preprocessor(self, func):
+        """Register a pass applied to each captured frame before encoding
+
+        Preprocessors are called as func(frame) on the capture thread and
+        must draw into the uint8 BGR frame in place — cv2.putText,
+        cv2.rectangle and friends all support this directly. Don't copy the
+        frame first and don't convert it to float: both would re-introduce
+        the per-frame allocations the capture path was built to avoid.
+        Register passes before start_streaming; they disable MJPG
+        passthrough since they need decoded pixels.
+        """
+        self.preprocessors.append(func)
+
+    def _publish_jpeg(self, data):
+        """Publish an already-encoded JPEG frame and wake all consumers"""
+        self._latest_jpeg = data
+        self._frame_count += 1
+        with self.frame_ready:
+            self.frame_ready.notify_all()
+
+    def _start_picamera2(self):
+        """Start streaming via the Pi camera stack's hardware JPEG encoder"""
+        if not PICAMERA2_AVAILABLE:
+            logger.error("picamera2 is not installed; cannot use the picamera2 backend")
+            return False
+        try:
+            self.picam2 = Picamera2(self.camera_index)
+            self.picam2.configure(self.picam2.create_video_configuration(
+                main={"size": (self.width, self.height)}))
+            # MJPEGEncoder runs on the VideoCore V4L2 M2M JPEG block, so the
+            # ARM cores never touch DCT or Huffman work
+            self.picam2.start_recording(MJPEGEncoder(),
+                                        FileOutput(_JpegStreamOutput(self)),
+                                        quality=Quality.MEDIUM)
+        except Exception as e:
+            logger.error(f"Failed to start Pi camera: {e}")
+            self.picam2 = None
+            return False
+        # Frames arrive already encoded, exactly like MJPG passthrough
+        self._mjpg_passthrough = True
+        self.is_streaming = True
+        self._refresh_status_json()
+        logger.info("Pi camera streaming started (hardware JPEG encoder)")
+        return True
+
     def start_streaming(self):
         """Start the camera streaming thread"""
+        if self.backend == 'picamera2':
+            return self._start_picamera2()
+
         if not self.initialize_camera():
             return False
         
+        if NUMBA_AVAILABLE:
+            # Trigger JIT compilation now instead of on the first viewer
+            downscale_nn(np.empty((4, 4, 3), dtype=np.uint8),
+                         np.empty((2, 2, 3), dtype=np.uint8))
+
         self.is_streaming = True
         self.streaming_thread = threading.Thread(target=self._capture_frames)
         self.streaming_thread.daemon = True
         self.streaming_thread.start()
+        self._refresh_status_json()
         logger.info("Camera streaming started")
         return True
     
     def stop_streaming(self):
         """Stop the camera streaming"""
         self.is_streaming = False
+        with self.frame_ready:
+            # Wake any streaming generators so they can exit
+            self.frame_ready.notify_all()
+        if self.picam2:
+            self.picam2.stop_recording()
+            self.picam2 = None
         if self.camera:
             self.camera.release()
+        self._refresh_status_json()
         logger.info("Camera streaming stopped")
     
     def _capture_frames(self):
         """Capture frames from camera in a separate thread"""
+        # Everything fixed for the lifetime of the stream is bound to locals
+        # once, so the per-frame loop runs on LOAD_FAST instead of repeated
+        # attribute lookups
+        camera_read = self.camera.read
+        camera_grab = self.camera.grab
+        camera_retrieve = self.camera.retrieve
+        passthrough = self._mjpg_passthrough
+        ring = self._ring
+        ring_slots = self.RING_SLOTS
+        frame_ready = self.frame_ready
+        encode_jpeg = self._encode_jpeg
+        preprocessors = self.preprocessors
+        fail_count = 0
         while self.is_streaming:
-            ret, frame = self.camera.read()
+            if passthrough:
+                ret, buf = camera_read()
+                if ret and buf is not None:
+                    data = buf.tobytes()
+                    ret = data[:2] == b'\xff\xd8'
+                    if ret:
+                        self._latest_jpeg = data
+                else:
+                    ret = False
+            else:
+                # grab() just dequeues the V4L2 buffer; retrieve() pays the
+                # decode. Kept split so a multi-camera setup can grab every
+                # camera back-to-back (temporally aligned) before decoding;
+                # for one camera the pair is exactly read()
+                ret = camera_grab()
+                if ret:
+                    ret, frame = camera_retrieve(ring[self._frame_count % ring_slots])
+                if ret:
+                    # Overlays etc. draw straight into the ring slot
+                    for preprocess in preprocessors:
+                        preprocess(frame)
+                    # Encode once here so N viewers cost one encode, not N
+                    jpeg = encode_jpeg(frame)
+                    ret = jpeg is not None
+                    if ret:
+                        self._latest_jpeg = jpeg
             if ret:
-                with self.lock:
-                    self.frame = frame.copy()
+                fail_count = 0
+                # Publish the frame by bumping the counter, then wake consumers
+                self._frame_count += 1
+                with frame_ready:
+                    frame_ready.notify_all()
             else:
-                logger.warning("Failed to read frame from camera")
-                time.sleep(0.1)
+                fail_count += 1
+                # Log at failure 1, 2, 4, 8, ... so a dead camera produces
+                # O(log N) messages instead of ten per second
+                if fail_count & (fail_count - 1) == 0:
+                    logger.warning(f"Failed to read frame from camera "
+                                   f"({fail_count} consecutive failures)")
+                time.sleep(min(0.1 * 2 ** min(fail_count - 1, 7), 5.0))
     
     def get_frame(self):
-        """Get the latest frame"""
-        with self.lock:
-            return self.frame.copy() if self.frame is not None else None
+        """Get the latest frame as a decoded BGR image
+
+        In ring mode this is a read-only view of the newest slot, not a
+        copy: the slot is not rewritten for another RING_SLOTS - 1 frames
+        (~100 ms at 30 fps), which is ample for encode-and-drop consumers.
+        Callers that want to draw on the frame or keep it longer should
+        copy() it themselves.
+        """
+        count = self._frame_count
+        if count == 0:
+            return None
+        if self._mjpg_passthrough:
+            # Frames only exist compressed in this mode; decode on demand
+            return cv2.imdecode(np.frombuffer(self._latest_jpeg, dtype=np.uint8),
+                                cv2.IMREAD_COLOR)
+        frame = self._ring[(count - 1) % self.RING_SLOTS]
+        frame.flags.writeable = False
+        return frame
     
-    def generate_frames(self):
-        """Generate frames for streaming"""
-        while self.is_streaming:
+    def _encode_jpeg(self, frame):
+        """Encode a BGR frame as JPEG bytes, preferring the SIMD TurboJPEG path"""
+        if self._tj_compressor is not None:
+            return self._tj_compressor.encode(frame)
+        if self._tj is not None:
+            # TJPF_BGR matches OpenCV's native layout, skipping a BGR->RGB pass
+            return self._tj.encode(frame, quality=85,
+                                   pixel_format=TJPF_BGR,
+                                   jpeg_subsample=TJSAMP_420)
+        ret, buffer = cv2.imencode('.jpg', frame, JPEG_ENCODE_PARAMS)
+        return buffer.tobytes() if ret else None
+
+    def get_scaled_jpeg(self, width, height=None):
+        """Get the latest frame downscaled to width x height as JPEG bytes
+
+        Client-supplied sizes are clamped to the capture resolution, and
+        encoded results are cached per frame, so many viewers at the same
+        resolution still cost a single downscale + encode.
+        """
+        width = max(1, min(width, self.width))
+        if height is None:
+            height = max(1, width * self.height // self.width)
+        else:
+            height = max(1, min(height, self.height))
+        count = self._frame_count
+        if count == 0:
+            return None
+        with self._scaled_lock:
+            entry = self._scaled_jpegs.get((width, height))
+            if entry is not None and entry[0] == count:
+                return entry[1]
             frame = self.get_frame()
-            if frame is not None:
-                # Encode frame as JPEG
-                ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
-                if ret:
-                    frame_bytes = buffer.tobytes()
-                    yield (b'--frame\r\n'
-                           b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-            time.sleep(1/30)  # 30 FPS
+            if frame is None:
+                return None
+            dst = entry[2] if entry is not None else np.empty((height, width, 3),
+                                                              dtype=np.uint8)
+            downscale_nn(frame, dst)
+            jpeg = self._encode_jpeg(dst)
+            if entry is None and len(self._scaled_jpegs) >= self.MAX_SCALED_CACHE:
+                # Evict the oldest resolution instead of growing unbounded
+                self._scaled_jpegs.pop(next(iter(self._scaled_jpegs)))
+            self._scaled_jpegs[(width, height)] = (count, jpeg, dst)
+        return jpeg
+
+    def generate_frames(self, width=None, height=None):
+        """Generate frames for streaming, paced by the capture thread"""
+        frame_ready = self.frame_ready
+        mjpeg_prefix = self._MJPEG_PREFIX
+        last_count = self._frame_count
+        while self.is_streaming:
+            with frame_ready:
+                # Sleep until the capture thread publishes a new frame; the
+                # re-check under the lock means a publish can never slip in
+                # between test and wait, and the timeout lets us notice a
+                # stopped stream
+                while self._frame_count == last_count and self.is_streaming:
+                    if not frame_ready.wait(timeout=1.0):
+                        break
+            count = self._frame_count
+            if count == last_count:
+                continue
+            # Always serve the newest cached JPEG; if we fell behind,
+            # intermediate frames are simply skipped
+            last_count = count
+            if width is not None:
+                frame_bytes = self.get_scaled_jpeg(width, height)
+            else:
+                frame_bytes = self._latest_jpeg
+            if frame_bytes is not None:
+                # join() builds the chunk in a single allocation, and the
+                # Content-Length lets strict MJPEG clients skip scanning
+                yield b''.join((mjpeg_prefix,
+                                str(len(frame_bytes)).encode('ascii'),
+                                b'\r\n\r\n', frame_bytes, b'\r\n'))
 
 # Flask app setup
 app = Flask(__name__)
@@ -112,12 +537,21 @@ def index():
 
 @app.route('/video_feed')
 def video_feed():
-    """Video streaming route"""
+    """Video streaming route; accepts optional width/height for a reduced stream"""
     if not camera_streamer.is_streaming:
         return "Camera not available", 503
-    
-    return Response(camera_streamer.generate_frames(),
-                   mimetype='multipart/x-mixed-replace; boundary=frame')
+
+    width = request.args.get('width', type=int)
+    height = request.args.get('height', type=int)
+    if (width is not None and width <= 0) or (height is not None and height <= 0):
+        return "Invalid stream dimensions", 400
+    # direct_passthrough hands the generator's chunks straight to the WSGI
+    # server instead of routing them through Werkzeug's response wrapping
+    response = Response(camera_streamer.generate_frames(width, height),
+                        mimetype='multipart/x-mixed-replace; boundary=frame',
+                        direct_passthrough=True)
+    response.headers['Cache-Control'] = 'no-cache, no-store'
+    return response
 
 @app.route('/api/camera/start', methods=['POST'])
 def start_camera():
@@ -136,21 +570,26 @@ def stop_camera():
 @app.route('/api/camera/status')
 def camera_status():
     """Get camera status"""
-    return jsonify({
-        "is_streaming": camera_streamer.is_streaming,
-        "width": camera_streamer.width,
-        "height": camera_streamer.height,
-        "fps": camera_streamer.fps
-    })
+    # Serialized on state changes, not per poll
+    return Response(camera_streamer.status_json(), mimetype='application/json')
+
+def detect_local_ip():
+    """Best-effort lookup of this machine's LAN IP address"""
+    try:
+        return socket.gethostbyname(socket.gethostname())
+    except OSError as e:
+        logger.warning(f"Could not resolve local IP address: {e}")
+        return '0.0.0.0'
 
 @app.route('/api/stream_url')
 def get_stream_url():
     """Get the streaming URL for mobile apps"""
-    # Get the server's IP address
-    import socket
-    hostname = socket.gethostname()
-    local_ip = socket.gethostbyname(hostname)
-    
+    # Resolved once at startup; hostname lookups can stall for seconds on
+    # Pis with misconfigured resolvers
+    local_ip = app.config.get('LOCAL_IP')
+    if local_ip is None:
+        local_ip = app.config['LOCAL_IP'] = detect_local_ip()
+
     return jsonify({
         "stream_url": f"http://{local_ip}:5000/video_feed",
         "status_url": f"http://{local_ip}:5000/api/camera/status"
@@ -159,6 +598,9 @@ def get_stream_url():
 def main():
     parser = argparse.ArgumentParser(description='CCTV Camera Streaming Server')
     parser.add_argument('--camera', type=int, default=0, help='Camera index (default: 0)')
+    parser.add_argument('--backend', choices=['opencv', 'picamera2'], default='opencv',
+                        help='Capture backend; picamera2 uses the Pi camera stack '
+                             'with hardware JPEG encoding (default: opencv)')
     parser.add_argument('--width', type=int, default=640, help='Frame width (default: 640)')
     parser.add_argument('--height', type=int, default=480, help='Frame height (default: 480)')
     parser.add_argument('--fps', type=int, default=30, help='Frames per second (default: 30)')
@@ -169,7 +611,11 @@ def main():
     
     # Initialize camera streamer with arguments
     global camera_streamer
-    camera_streamer = CameraStreamer(args.camera, args.width, args.height, args.fps)
+    camera_streamer = CameraStreamer(args.camera, args.width, args.height, args.fps,
+                                     backend=args.backend)
+
+    # Resolve the LAN IP once so /api/stream_url never blocks on DNS
+    app.config['LOCAL_IP'] = detect_local_ip()
     
     # Auto-start camera
     if not camera_streamer.start_streaming():
@@ -177,7 +623,15 @@ def main():
         return
     
     try:
-        app.run(host=args.host, port=args.port, debug=False, threaded=True)
+        if WAITRESS_AVAILABLE:
+            # MJPEG viewers hold their connection (and worker thread) open
+            # indefinitely, so bound both rather than spawning a thread per
+            # connection like Flask's dev server does
+            waitress_serve(app, host=args.host, port=args.port,
+                           threads=8, connection_limit=16)
+        else:
+            logger.warning("waitress not installed; using Flask's development server")
+            app.run(host=args.host, port=args.port, debug=False, threaded=True)
     except KeyboardInterrupt:
         logger.info("Shutting down server...")
     finally:
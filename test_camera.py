@@ -5,9 +5,19 @@ Tests if the USB camera is accessible and working
 """
 
 import cv2
+import fcntl
+import glob
+import os
+import struct
 import sys
 import time
 
+# From linux/videodev2.h: VIDIOC_QUERYCAP ioctl and capability flags
+VIDIOC_QUERYCAP = 0x80685600
+V4L2_CAP_VIDEO_CAPTURE = 0x00000001
+V4L2_CAP_DEVICE_CAPS = 0x80000000
+V4L2_CAPABILITY_SIZE = 104  # sizeof(struct v4l2_capability)
+
 def test_camera(camera_index=0):
     """Test if camera is accessible"""
     print(f"Testing camera {camera_index}...")
@@ -59,17 +69,40 @@ def test_camera(camera_index=0):
         print(f"❌ Error testing camera: {e}")
         return False
 
+def is_capture_device(path):
+    """Check whether a /dev/video* node supports video capture via V4L2"""
+    try:
+        fd = os.open(path, os.O_RDWR)
+    except OSError:
+        return False
+    try:
+        caps_struct = bytearray(V4L2_CAPABILITY_SIZE)
+        fcntl.ioctl(fd, VIDIOC_QUERYCAP, caps_struct)
+        capabilities = struct.unpack_from('<I', caps_struct, 84)[0]
+        if capabilities & V4L2_CAP_DEVICE_CAPS:
+            # Per-node capabilities exclude e.g. metadata-only nodes
+            capabilities = struct.unpack_from('<I', caps_struct, 88)[0]
+        return bool(capabilities & V4L2_CAP_VIDEO_CAPTURE)
+    except OSError:
+        return False
+    finally:
+        os.close(fd)
+
 def list_cameras():
     """List available cameras"""
     print("🔍 Scanning for available cameras...")
     available_cameras = []
-    
-    for i in range(10):  # Check first 10 camera indices
-        cap = cv2.VideoCapture(i)
-        if cap.isOpened():
-            available_cameras.append(i)
-            cap.release()
-    
+
+    # A QUERYCAP ioctl per device node is microseconds; opening each index
+    # through cv2.VideoCapture costs hundreds of milliseconds on a Pi
+    for path in sorted(glob.glob('/dev/video*')):
+        try:
+            index = int(path.replace('/dev/video', ''))
+        except ValueError:
+            continue
+        if is_capture_device(path):
+            available_cameras.append(index)
+
     if available_cameras:
         print(f"📷 Found {len(available_cameras)} camera(s): {available_cameras}")
     else: